@@ -1,4 +1,4 @@
-"""Time domain filters for random noise.
+"""Constituent models of the stochastic method.
 
 This file contains the functions of the constituant models that
 are combined to compute the stochastic ground motion model for arbitrary
@@ -10,69 +10,387 @@ functions:
 motion_factor
     The scaling of ground motion to displacement, velocity or acceleration.
 
+make_motion_factor
+    motion_factor specialised for a fixed motion parameter.
+
 source_scf
     A generic single corner frequency model for a seismic source.
 
+source_scf_batch
+    source_scf for many scenarios on a shared frequency grid.
+
+f_idep_attenutation, f_dep_attenuation
+    Anelastic attenuation along the propagation path.
+
+single_geospreading
+    Geometrical spreading with distance.
+
+compute_log_spectrum
+    The sum of the source, path and motion terms in a single pass.
+
 """
+import math
+import weakref
 import numpy as np
-from typing import Union
+from math import pi as _PI, log as _LOG
+from numba import config, njit, prange
+from typing import Callable, Union
+
+
+# Module level bindings avoid repeated attribute lookups in the Python
+# wrappers; the njit kernels resolve globals at compile time and keep math.*
+_LOG_10 = _LOG(10.0)
+_INV_LN10 = 1.0 / _LOG_10
+_log10 = np.log10
+
+# fastmath without the 'nnan'/'ninf' flags: ln(0) = -inf for a 0 Hz bin
+# has to propagate through exp() to give a zero term.
+_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+
+# Per-frequency terms shared by the single-term and fused kernels.
+@njit(fastmath=_FASTMATH, cache=True)
+def _motion_factor_point(fi, e):
+    return e * math.log10(2 * math.pi * fi)
+
+
+# The source and attenuation terms take their constants pre-cast by the
+# caller (s = 1/(gam ln10), gn = gam*n, ea = 1-a) so that float32 inputs
+# are not promoted to float64 by numeric literals. Powers of f are taken
+# as exp of the cached ln(f) rather than with pow.
+@njit(fastmath=_FASTMATH, cache=True)
+def _source_scf_point(log_fi, llpsp, log_fc, s, gn):
+    return llpsp - s * math.log1p(math.exp(gn * (log_fi - log_fc)))
+
+
+# Closed forms of the source term for the Brune (gam=1, n=2) and
+# Boatwright (gam=2, n=2) models, with r = f/fc squared by multiplication
+# instead of a transcendental per frequency.
+@njit(fastmath=_FASTMATH, cache=True)
+def _source_brune_point(fi, llpsp, inv_fc, s):
+    r = fi * inv_fc
+    return llpsp - s * math.log1p(r * r)
+
+
+@njit(fastmath=_FASTMATH, cache=True)
+def _source_boatwright_point(fi, llpsp, inv_fc, s):
+    r = fi * inv_fc
+    r2 = r * r
+    return llpsp - s * math.log1p(r2 * r2)
+
+
+@njit(fastmath=_FASTMATH, cache=True)
+def _f_dep_attenuation_point(log_fi, ea, k):
+    return k * math.exp(ea * log_fi)
+
+
+@njit(parallel=True, fastmath=_FASTMATH, cache=True)
+def _motion_factor_kernel(f, e, out):
+    for i in prange(f.size):
+        out[i] = _motion_factor_point(f[i], e)
+
+
+@njit(parallel=True, fastmath=_FASTMATH, cache=True)
+def _source_scf_kernel(log_f, llpsp, log_fc, s, gn, out):
+    for i in prange(log_f.size):
+        out[i] = _source_scf_point(log_f[i], llpsp, log_fc, s, gn)
+
+
+@njit(parallel=True, fastmath=_FASTMATH, cache=True)
+def _source_brune_kernel(f, llpsp, inv_fc, s, out):
+    for i in prange(f.size):
+        out[i] = _source_brune_point(f[i], llpsp, inv_fc, s)
+
+
+@njit(parallel=True, fastmath=_FASTMATH, cache=True)
+def _source_boatwright_kernel(f, llpsp, inv_fc, s, out):
+    for i in prange(f.size):
+        out[i] = _source_boatwright_point(f[i], llpsp, inv_fc, s)
+
+
+@njit(parallel=True, fastmath=_FASTMATH, cache=True)
+def _f_dep_attenuation_kernel(log_f, ea, k, out):
+    for i in prange(log_f.size):
+        out[i] = _f_dep_attenuation_point(log_f[i], ea, k)
+
+
+@njit(parallel=True, fastmath=_FASTMATH, cache=True)
+def _log_spectrum_idep_kernel(f, log_f, llpsp, log_fc, s, gn, k, g, e, out):
+    for i in prange(f.size):
+        out[i] = (_source_scf_point(log_f[i], llpsp, log_fc, s, gn)
+                  + k * f[i]
+                  + g)
+        if e != 0:
+            out[i] += _motion_factor_point(f[i], e)
+
+
+@njit(parallel=True, fastmath=_FASTMATH, cache=True)
+def _log_spectrum_dep_kernel(f, log_f, llpsp, log_fc, s, gn, ea, k, g, e,
+                             out):
+    for i in prange(f.size):
+        out[i] = (_source_scf_point(log_f[i], llpsp, log_fc, s, gn)
+                  + _f_dep_attenuation_point(log_f[i], ea, k)
+                  + g)
+        if e != 0:
+            out[i] += _motion_factor_point(f[i], e)
+
+
+# Natural log of the read-only frequency grids passed to the models, keyed
+# by id() and dropped when the grid is garbage collected. Parameter sweeps
+# reuse one grid for every scenario, so ln(f) is only computed once.
+# Writeable grids are never cached. Each entry keeps a private copy of the
+# grid it was computed from and is only reused while the grid still equals
+# it, so a grid that is unfrozen and edited between calls is recomputed.
+_LOG_F_CACHE = {}
+
+
+def _log(f: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    # A 0 Hz bin (e.g. from np.fft.rfftfreq) is expected and maps to -inf
+    with np.errstate(divide='ignore'):
+        return np.log(np.ascontiguousarray(f, dtype=dtype)).reshape(-1)
+
+
+def _log_frequencies(f: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    if not isinstance(f, np.ndarray) or f.size == 0 or f.flags.writeable:
+        return _log(f, dtype)
+
+    key = id(f)
+    hit = _LOG_F_CACHE.get(key)
+    if (hit is not None and hit[0] == np.dtype(dtype)
+            and np.array_equal(hit[1], f)):
+        return hit[2]
+
+    log_f = _log(f, dtype)
+    log_f.flags.writeable = False
+    if hit is None:
+        weakref.finalize(f, _LOG_F_CACHE.pop, key, None)
+    _LOG_F_CACHE[key] = (np.dtype(dtype), f.copy(), log_f)
+    return log_f
+
+
+def _is_scalar(*args) -> bool:
+    return all(np.ndim(arg) == 0 for arg in args)
+
+
+def _as_dtype(dtype: np.dtype, *args) -> list:
+    # Python numbers take the precision of the arrays they meet, so only
+    # the other parameters are converted to the working precision
+    return [x if type(x) in (int, float) else np.asarray(x, dtype=dtype)
+            for x in args]
+
+
+def _shaped_like(out: np.ndarray, f: np.ndarray) -> np.ndarray:
+    # Kernels work on flat arrays; give the result f's shape back, so a
+    # scalar frequency gives a scalar result
+    return out.reshape(np.shape(f))[()]
+
+
+# The kernels only beat the equivalent NumPy expressions when numba can
+# vectorise exp/log through SVML, and on grids large enough to amortise
+# the call overhead. Otherwise the wrappers evaluate with NumPy.
+_USE_KERNELS = config.USING_SVML
+_KERNEL_MIN_SIZE = 4096
+
+
+def _use_kernels(f: np.ndarray, dtype: np.dtype, *params) -> bool:
+    # Contiguous 1-D grids in the working precision with scalar parameters
+    return (_USE_KERNELS and isinstance(f, np.ndarray) and f.ndim == 1
+            and f.size >= _KERNEL_MIN_SIZE and f.dtype == dtype
+            and f.flags.c_contiguous and _is_scalar(*params))
+
+
+# Exponent of 2πf relating displacement to each motion parameter.
+_MOTION_EXP = {'disp': 0.0, 'vel': 1.0, 'acc': 2.0}
+
+
+def _motion_exponent(motion: str) -> float:
+    e = _MOTION_EXP.get(motion.lower())
+    if e is None:
+        raise ValueError(f"Motion must be {list(_MOTION_EXP)}")
+    return e
+
+
+def _scale_motion(f: np.ndarray, e: float) -> np.ndarray:
+    if e == 0.0:
+        return np.zeros(np.shape(f))[()]
+    # log10[(2πf)^e] = e * log10(2πf), so vel and acc share one kernel
+    if not _use_kernels(f, np.float64):
+        return e * _log10(np.multiply(2 * _PI, f))
+    f_flat = np.ascontiguousarray(f, dtype=np.float64).reshape(-1)
+    out = np.empty_like(f_flat)
+    _motion_factor_kernel(f_flat, e, out)
+    return _shaped_like(out, f)
 
 
 def motion_factor(f: np.ndarray,
                   motion: str = 'disp'
-                  ) -> Union[np.ndarray, None]:
+                  ) -> np.ndarray:
     """
     A function to scale the source spectrum to the desired motion parameter.
     Add to differentiate and subtract to integrate.
 
     Parameters
     ----------
+    f : np.ndarray
+        The frequencies to compute the scaling for [Hz].
+    motion : str
+        The ground motion parameter ('disp', 'vel' or 'acc').
     """
+    return _scale_motion(f, _motion_exponent(motion))
 
-    gms = ['disp', 'vel', 'acc']
 
-    if motion.lower() not in gms:
-        raise ValueError(f"Motion must be {gms}")
+def make_motion_factor(motion: str = 'disp'
+                       ) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Specialise motion_factor for a fixed motion parameter. The motion is
+    validated once and the returned function only takes the frequencies.
 
-    if motion.lower() == 'disp':
-        return 0
+    Parameters
+    ----------
+    motion : str
+        The ground motion parameter ('disp', 'vel' or 'acc').
+
+    Returns
+    -------
+    Callable
+        A function f -> motion_factor(f, motion).
+    """
+    e = _motion_exponent(motion)
 
-    if motion.lower() == 'vel':
-        return np.log10(2 * np.pi * f)
+    def _motion_factor(f: np.ndarray) -> np.ndarray:
+        return _scale_motion(f, e)
 
-    if motion.lower() == 'acc':
-        return np.log10(np.power(2 * np.pi * f, 2))
+    return _motion_factor
 
 
 # DEFAULT PARAMS FOR SOURCE MODE:
 # BRUNE_MODEL = (1, 2) # omega squared
 # BOATWRIGHT_MODEL = (2, 2) # omega cubed
+_SOURCE_SCF_SPECIAL = {(1, 2): _source_brune_kernel,
+                       (2, 2): _source_boatwright_kernel}
 
 
 def source_scf(f: np.ndarray,
                llpsp: float,
                fc: float,
                gam: float,
-               n: float
+               n: float,
+               dtype: np.dtype = np.float64
                ) -> np.ndarray:
     """
     Generic single corner frequency model for the far-field displacement
     spectrum of an arbitrary seismic source as a function of frequency (log
-    base 10 representation).
+    base 10 representation). The log10(1 + (f/fc)^(gam*n)) term is evaluated
+    with log1p, so for f << fc it decays smoothly towards zero rather than
+    being rounded to exactly zero.
+
+    Large contiguous grids are evaluated with compiled kernels when numba
+    has SVML, with specialised closed forms for the Brune (gam=1, n=2) and
+    Boatwright (gam=2, n=2) models; otherwise the NumPy expression is used.
+    The kernels cache ln(f) for read-only frequency grids, so when
+    evaluating many scenarios on one grid, set f.flags.writeable = False
+    first.
 
     Parameters
     ----------
 
     llpsp :
         Log10 amplitude of the long period plateau (e.g. log10[M0])
+    dtype : np.dtype
+        The floating point precision of the computation and result.
+        np.float32 halves the memory traffic on large frequency grids and is
+        ample for log10 amplitudes.
+    """
+    if not _use_kernels(f, dtype, llpsp, fc, gam, n):
+        # Also covers per-scenario parameters that broadcast against f
+        # (e.g. a column per scenario), which the kernels cannot express
+        f = np.asarray(f, dtype=dtype)
+        llpsp, fc, gam, n = _as_dtype(dtype, llpsp, fc, gam, n)
+        return llpsp - (_INV_LN10 / gam) * np.log1p((f / fc)**(gam * n))
+
+    t = np.dtype(dtype).type
+    # gam and n are scalars here but may be 0-d arrays, which are unhashable
+    special = _SOURCE_SCF_SPECIAL.get((float(gam), float(n)))
+    if special is not None:
+        f_flat = np.ascontiguousarray(f, dtype=dtype).reshape(-1)
+        out = np.empty_like(f_flat)
+        special(f_flat, t(llpsp), t(1 / fc), t(_INV_LN10 / gam), out)
+        return _shaped_like(out, f)
+
+    log_f = _log_frequencies(f, dtype)
+    args = (t(llpsp), t(math.log(fc)), t(_INV_LN10 / gam), t(gam * n))
+    out = np.empty_like(log_f)
+    _source_scf_kernel(log_f, *args, out)
+    return _shaped_like(out, f)
+
+
+def source_scf_batch(f: np.ndarray,
+                     llpsp: Union[float, np.ndarray],
+                     fc: Union[float, np.ndarray],
+                     gam: Union[float, np.ndarray],
+                     n: Union[float, np.ndarray],
+                     dtype: np.dtype = np.float64
+                     ) -> np.ndarray:
+    """
+    source_scf for many scenarios sharing one frequency grid. ln(f) and
+    ln(fc) are each computed once and combined by broadcasting, so S
+    scenarios on F frequencies cost S + F logarithms rather than S * F.
+
+    ln(f) is cached for read-only frequency grids, so when evaluating many
+    scenarios on one grid, set f.flags.writeable = False first.
+
+    Parameters
+    ----------
+    f : np.ndarray
+        The 1-D frequency grid shared by all scenarios [Hz].
+    llpsp : float or np.ndarray
+        Log10 amplitude of the long period plateau of each scenario.
+    fc : float or np.ndarray
+        The corner frequency of each scenario [Hz].
+    gam : float or np.ndarray
+        The source spectrum shape parameter of each scenario.
+    n : float or np.ndarray
+        The high frequency fall-off rate of each scenario.
+    dtype : np.dtype
+        The floating point precision of the computation and result.
+
+    Returns
+    -------
+    np.ndarray
+        The log10 source spectra, shape (scenarios, frequencies).
+    """
+    llpsp, fc, gam, n = (
+        np.ascontiguousarray(x, dtype=dtype).reshape(-1, 1) for x in
+        np.broadcast_arrays(llpsp, fc, gam, n))
+    log_f = _log_frequencies(f, dtype)
+    x = np.exp((gam * n) * (log_f - np.log(fc)))
+    return llpsp - (np.dtype(dtype).type(_INV_LN10) / gam) * np.log1p(x)
+
+
+def _attenuation_coef(Q: float, R: float, b: float) -> float:
     """
-    return llpsp - (1 / gam) * np.log10((1 + (f / fc)**(gam * n)))
+    The frequency independent part of the attenuation models, -πR/(Qb) in
+    log10 units.
+    """
+    Q, R, b = _as_dtype(np.float64, Q, R, b)
+    return -(_PI * (R * _INV_LN10)) / (Q * b)
+
+
+def _check_attenuation_exponent(a: float) -> None:
+    # Validated here so the compiled kernels stay free of error paths
+    if type(a) in (int, float):
+        valid = 0 <= a < 1
+    else:
+        valid = np.all((0 <= np.asarray(a)) & (np.asarray(a) < 1))
+    if not valid:
+        raise ValueError("a must be in range 0 <= a < 1.")
 
 
 def f_idep_attenutation(f: np.ndarray,
                         Q: float,
                         R: float,
                         b: float,
+                        dtype: np.dtype = np.float64
                         ) -> np.ndarray:
     """
     Frequency independent attenuation model (log base 10 representation).
@@ -87,8 +405,11 @@ def f_idep_attenutation(f: np.ndarray,
         The propagation distance in km or m.
     b : float
         Average seismic velocity along the path in km of m.
+    dtype : np.dtype
+        The floating point precision of the computation and result.
     """
-    return -(((np.pi * f * R) / (Q * b)) / np.log(10))
+    f = np.asarray(f, dtype=dtype)
+    return np.multiply(f, np.asarray(_attenuation_coef(Q, R, b), dtype=dtype))
 
 
 def f_dep_attenuation(f: np.ndarray,
@@ -96,10 +417,16 @@ def f_dep_attenuation(f: np.ndarray,
                       Q: float,
                       R: float,
                       b: float,
+                      dtype: np.dtype = np.float64
                       ) -> np.ndarray:
     """
     Frequency dependent attenuation model (log base 10 representation).
 
+    Large contiguous grids are evaluated with a compiled kernel when numba
+    has SVML (see source_scf), which caches ln(f) for read-only frequency
+    grids, so when evaluating many scenarios on one grid, set
+    f.flags.writeable = False first.
+
     Parameters
     ----------
     f : np.ndarray
@@ -112,13 +439,120 @@ def f_dep_attenuation(f: np.ndarray,
         The propagation distance [km or m].
     b : float
         Average seismic velocity along the path [km or m].
+    dtype : np.dtype
+        The floating point precision of the computation and result.
+    """
+    _check_attenuation_exponent(a)
+    if not _use_kernels(f, dtype, a, Q, R, b):
+        f = np.asarray(f, dtype=dtype)
+        a, k = _as_dtype(dtype, a, _attenuation_coef(Q, R, b))
+        return k * f**(1 - a)
+
+    t = np.dtype(dtype).type
+    log_f = _log_frequencies(f, dtype)
+    out = np.empty_like(log_f)
+    _f_dep_attenuation_kernel(log_f, t(1 - a), t(_attenuation_coef(Q, R, b)),
+                              out)
+    return _shaped_like(out, f)
+
+
+def single_geospreading(R: Union[float, np.ndarray],
+                        p: float = 1,
+                        out: np.ndarray = None
+                        ) -> Union[float, np.ndarray]:
+    """
+    Geometrical spreading model, R^-p (log base 10 representation).
+
+    Parameters
+    ----------
+    R : float or np.ndarray
+        The propagation distance [km or m].
+    p : float
+        The geometrical spreading exponent.
+    out : np.ndarray
+        Optional array to write the result into (e.g. to reuse a buffer
+        over a dense distance grid). Array distances are computed in place
+        without intermediate arrays.
     """
-    assert 0 <= a < 1, "a must be in range 0 <= a < 1."
-    return -(np.pi * (f**(1 - a)) * (R / Q * b) / np.log(10))
+    if out is None and np.ndim(R) == 0:
+        return -p * _log10(R)
+    out = _log10(R, out=out)
+    return np.multiply(out, -p, out=out)
 
 
-def single_geospreading(R: Union[float, np.ndarray], p=1):
+def compute_log_spectrum(f: np.ndarray,
+                         llpsp: float,
+                         fc: float,
+                         gam: float,
+                         n: float,
+                         Q: float,
+                         R: float,
+                         b: float,
+                         a: float = 0.0,
+                         p: float = 1,
+                         motion: str = 'disp'
+                         ) -> np.ndarray:
     """
+    The complete log10 spectrum of a scenario, i.e. the sum of source_scf,
+    the attenuation model, single_geospreading and motion_factor.
 
+    Large contiguous grids are evaluated in a single fused pass over the
+    frequencies when numba has SVML (see source_scf), which caches ln(f)
+    for read-only frequency grids, so when evaluating many scenarios on one
+    grid, set f.flags.writeable = False first. Otherwise the terms are
+    summed with NumPy.
+
+    Parameters
+    ----------
+    f : np.ndarray
+        The frequencies to compute the spectrum for [Hz].
+    llpsp : float
+        Log10 amplitude of the long period plateau (e.g. log10[M0]).
+    fc : float
+        The corner frequency of the source [Hz].
+    gam : float
+        The source spectrum shape parameter (see source_scf).
+    n : float
+        The high frequency fall-off rate of the source (see source_scf).
+    Q : float
+        The frequency independent quality factor.
+    R : float
+        The propagation distance [km or m].
+    b : float
+        Average seismic velocity along the path [km or m].
+    a : float
+        The frequency dependent factor for attenuation. If 0 the frequency
+        independent model (f_idep_attenutation) is used.
+    p : float
+        The geometrical spreading exponent.
+    motion : str
+        The ground motion parameter ('disp', 'vel' or 'acc').
     """
-    return -p * np.log10(R)
+    e = _motion_exponent(motion)
+    _check_attenuation_exponent(a)
+    if not _use_kernels(f, np.float64, llpsp, fc, gam, n, Q, R, b, a, p):
+        # Sum the individual terms, which also broadcasts array parameters
+        if _is_scalar(a) and a == 0:
+            atten = f_idep_attenutation(f, Q, R, b)
+        else:
+            atten = f_dep_attenuation(f, a, Q, R, b)
+        spectrum = (source_scf(f, llpsp, fc, gam, n) + atten
+                    + single_geospreading(R, p))
+        if e != 0:
+            spectrum += _scale_motion(f, e)
+        return spectrum
+
+    g = -p * math.log10(R)
+    k = _attenuation_coef(Q, R, b)
+    log_f = _log_frequencies(f, np.float64)
+    f_flat = np.ascontiguousarray(f, dtype=np.float64).reshape(-1)
+    out = np.empty_like(f_flat)
+
+    if a == 0:
+        _log_spectrum_idep_kernel(f_flat, log_f, llpsp, math.log(fc),
+                                  _INV_LN10 / gam, gam * n, k, g, e, out)
+    else:
+        _log_spectrum_dep_kernel(f_flat, log_f, llpsp, math.log(fc),
+                                 _INV_LN10 / gam, gam * n, 1 - a, k, g, e,
+                                 out)
+    return _shaped_like(out, f)
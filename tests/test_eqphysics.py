@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""Tests for `eqstochsim.eqphysics`."""
+
+import numpy as np
+
+
+from eqstochsim import eqphysics
+
+
+def test_fc_broadcasts():
+    """Array inputs give the same corner frequencies as scalar calls."""
+    mw = np.linspace(3, 7, 9)
+    sd = np.array([1e6, 5e6, 1e7])[:, None]
+    mo = eqphysics.mo_from_mw(mw)
+    fcs = eqphysics.fc(3500.0, sd, mo)
+    assert fcs.shape == (3, 9)
+    for i in range(3):
+        for j in range(9):
+            np.testing.assert_allclose(
+                fcs[i, j], 0.49 * 3500.0 * (sd[i, 0] / mo[j])**(1 / 3),
+                rtol=1e-12)
+            np.testing.assert_allclose(
+                eqphysics.fc(3500.0, sd[i, 0], mo[j]), fcs[i, j], rtol=1e-15)
+
+
+def test_sd_inverts_fc():
+    """sd inverts fc when c = k * (16 / 7)**(1 / 3)."""
+    mo = eqphysics.mo_from_mw(np.array([4.0, 5.0, 6.0]))
+    f = eqphysics.fc(3500.0, 3e6, mo, c=0.37 * (16 / 7)**(1 / 3))
+    np.testing.assert_allclose(eqphysics.sd(f, mo, 3500.0), 3e6, rtol=1e-12)
+
+
+def test_mo_from_mw():
+    """Scalar and array magnitudes map to the same moments to rounding."""
+    mws = np.linspace(2.0, 9.0, 1001)
+    np.testing.assert_allclose(eqphysics.mo_from_mw(mws),
+                               [eqphysics.mo_from_mw(float(m)) for m in mws],
+                               rtol=1e-15)
+    np.testing.assert_allclose(eqphysics.mo_from_mw(6.0),
+                               10**(1.5 * (6.0 + 6.0333)))
+
+
+def test_scenario_batch():
+    """Batched source parameters match per-scenario calls."""
+    batch = eqphysics.ScenarioBatch.from_mw(3500.0, [1e6, 1e7], [4.0, 6.0])
+    assert len(batch) == 2
+    np.testing.assert_allclose(batch.mo[1], eqphysics.mo_from_mw(6.0),
+                               rtol=1e-15)
+    assert batch.vs.shape == batch.sd.shape == batch.mo.shape == (2,)
+
+    fcs = batch.corner_freqs()
+    for i in range(len(batch)):
+        np.testing.assert_allclose(
+            fcs[i], eqphysics.fc(batch.vs[i], batch.sd[i], batch.mo[i]),
+            rtol=1e-15)
+    k = 0.49 * (7 / 16)**(1 / 3)
+    np.testing.assert_allclose(batch.stress_drops(fcs, k=k), batch.sd,
+                               rtol=1e-12)
+
+
+def test_scenario_batch_identity_equality():
+    """Batches compare by identity rather than element-wise."""
+    batch = eqphysics.ScenarioBatch(3500.0, 1e6, [1e15, 1e16])
+    assert batch == batch
+    assert batch != eqphysics.ScenarioBatch(3500.0, 1e6, [1e15, 1e16])
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+
+"""Tests for `eqstochsim.models`."""
+
+import warnings
+
+import numpy as np
+import pytest
+
+
+from eqstochsim import models
+
+
+@pytest.fixture
+def f():
+    """Log-spaced frequency grid [Hz]."""
+    return np.logspace(-2, 2, 257)
+
+
+@pytest.mark.parametrize("gam, n", [(1, 2), (2, 2), (1.5, 2), (1, 3)])
+def test_source_scf(f, gam, n):
+    """Compiled source model matches the closed form expression."""
+    expected = 17.0 - (1 / gam) * np.log10(1 + (f / 1.5)**(gam * n))
+    np.testing.assert_allclose(models.source_scf(f, 17.0, 1.5, gam, n),
+                               expected, rtol=1e-12)
+
+
+def test_source_scf_low_frequency():
+    """Far below the corner the fall-off term is not rounded to zero."""
+    f = np.array([1e-10, 1e-6])
+    np.testing.assert_allclose(-models.source_scf(f, 0.0, 1.0, 1, 2),
+                               f**2 / np.log(10), rtol=1e-12)
+
+
+def test_motion_factor(f):
+    """Velocity and acceleration are one and two factors of 2πf."""
+    np.testing.assert_array_equal(models.motion_factor(f, 'disp'),
+                                  np.zeros_like(f))
+    np.testing.assert_allclose(models.motion_factor(f, 'vel'),
+                               np.log10(2 * np.pi * f), rtol=1e-12)
+    np.testing.assert_allclose(models.motion_factor(f, 'acc'),
+                               np.log10((2 * np.pi * f)**2), rtol=1e-12)
+    with pytest.raises(ValueError):
+        models.motion_factor(f, 'jerk')
+
+
+def test_f_idep_attenuation(f):
+    """Frequency independent attenuation matches the closed form."""
+    expected = -(np.pi * f * 50.0) / (600.0 * 3.5) / np.log(10)
+    np.testing.assert_allclose(
+        models.f_idep_attenutation(f, 600.0, 50.0, 3.5), expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("a", [0.0, 0.3])
+@pytest.mark.parametrize("motion", ['disp', 'vel', 'acc'])
+def test_compute_log_spectrum(f, a, motion):
+    """Fused spectrum equals the sum of the individual terms."""
+    if a == 0:
+        atten = models.f_idep_attenutation(f, 600.0, 50.0, 3.5)
+    else:
+        atten = models.f_dep_attenuation(f, a, 600.0, 50.0, 3.5)
+    expected = (models.source_scf(f, 17.0, 1.5, 1, 2) + atten
+                + models.single_geospreading(50.0)
+                + models.motion_factor(f, motion))
+    np.testing.assert_allclose(
+        models.compute_log_spectrum(f, 17.0, 1.5, 1, 2, 600.0, 50.0, 3.5,
+                                    a=a, motion=motion),
+        expected, rtol=1e-12)
+
+
+def test_f_dep_attenuation(f):
+    """Frequency dependent attenuation divides by both Q and b."""
+    expected = -(np.pi * f**0.7 * 50.0) / (600.0 * 3.5) / np.log(10)
+    np.testing.assert_allclose(
+        models.f_dep_attenuation(f, 0.3, 600.0, 50.0, 3.5), expected,
+        rtol=1e-12)
+    np.testing.assert_allclose(
+        models.f_dep_attenuation(f, 0.0, 600.0, 50.0, 3.5),
+        models.f_idep_attenutation(f, 600.0, 50.0, 3.5), rtol=1e-12)
+    for a in (-0.1, 1.0):
+        with pytest.raises(ValueError):
+            models.f_dep_attenuation(f, a, 600.0, 50.0, 3.5)
+        with pytest.raises(ValueError):
+            models.compute_log_spectrum(f, 17.0, 1.5, 1, 2, 600.0, 50.0, 3.5,
+                                        a=a)
+
+
+@pytest.mark.parametrize("motion", ['disp', 'vel', 'ACC'])
+def test_make_motion_factor(f, motion):
+    """The specialised closure matches motion_factor."""
+    np.testing.assert_array_equal(models.make_motion_factor(motion)(f),
+                                  models.motion_factor(f, motion))
+    with pytest.raises(ValueError):
+        models.make_motion_factor('jerk')
+
+
+def test_float32(f):
+    """Single precision results stay single precision and agree with double."""
+    for result, expected in [
+            (models.source_scf(f, 17.0, 1.5, 2, 2, dtype=np.float32),
+             models.source_scf(f, 17.0, 1.5, 2, 2)),
+            (models.f_idep_attenutation(f, 600.0, 50.0, 3.5,
+                                        dtype=np.float32),
+             models.f_idep_attenutation(f, 600.0, 50.0, 3.5)),
+            (models.f_dep_attenuation(f, 0.3, 600.0, 50.0, 3.5,
+                                      dtype=np.float32),
+             models.f_dep_attenuation(f, 0.3, 600.0, 50.0, 3.5))]:
+        assert result.dtype == np.float32
+        np.testing.assert_allclose(result, expected, rtol=1e-5, atol=1e-5)
+
+
+def test_log_frequency_cache():
+    """ln(f) is only cached for read-only grids and freed with them."""
+    f = np.logspace(-1, 1, 11)
+    models._log_frequencies(f, np.float64)
+    assert id(f) not in models._LOG_F_CACHE
+
+    f.flags.writeable = False
+    first = models._log_frequencies(f, np.float64)
+    assert id(f) in models._LOG_F_CACHE
+    assert models._log_frequencies(f, np.float64) is first
+    np.testing.assert_array_equal(first, np.log(f))
+
+    # A cached grid that is unfrozen, edited and frozen again is recomputed
+    f.flags.writeable = True
+    f[5] = 50.0
+    f.flags.writeable = False
+    assert models._log_frequencies(f, np.float64)[5] == np.log(50.0)
+
+    # Edits through a writeable base are caught the same way
+    base = np.logspace(-1, 1, 11)
+    view = base[:]
+    view.flags.writeable = False
+    models._log_frequencies(view, np.float64)
+    base[5] = 50.0
+    assert models._log_frequencies(view, np.float64)[5] == np.log(50.0)
+
+    key = id(f)
+    del f
+    assert key not in models._LOG_F_CACHE
+
+
+def test_source_scf_batch(f):
+    """Each row of the batch matches a single scenario call."""
+    llpsp = np.array([15.0, 17.0, 19.0])
+    fc = np.array([5.0, 1.5, 0.2])
+    gam = np.array([1.0, 2.0, 1.0])
+    out = models.source_scf_batch(f, llpsp, fc, gam, 2)
+    assert out.shape == (3, f.size)
+    for i in range(3):
+        np.testing.assert_allclose(
+            out[i], models.source_scf(f, llpsp[i], fc[i], gam[i], 2),
+            rtol=1e-12)
+
+
+def test_single_geospreading():
+    """Array distances can be written into a preallocated buffer."""
+    R = np.linspace(1.0, 200.0, 50)
+    buf = np.empty_like(R)
+    out = models.single_geospreading(R, 1.5, out=buf)
+    assert out is buf
+    np.testing.assert_allclose(out, -1.5 * np.log10(R), rtol=1e-12)
+    assert models.single_geospreading(100.0) == -2.0
+    assert models.single_geospreading(np.array(100.0)) == -2.0
+
+
+def test_array_parameters():
+    """Per-scenario parameters broadcast against f, as in the notebooks."""
+    F = np.tile(np.logspace(-1, 1, 50)[:, None], (1, 7))
+    MO = np.logspace(15, 18, 7)
+    FC = np.linspace(0.5, 5.0, 7)
+    for gam, n in [(1, 2), (1.5, 2)]:
+        E = models.source_scf(F, np.log10(MO), FC, gam, n)
+        assert E.shape == (50, 7)
+        for j in range(7):
+            np.testing.assert_allclose(
+                E[:, j], models.source_scf(F[:, j], np.log10(MO[j]), FC[j],
+                                           gam, n), rtol=1e-12)
+
+    R = np.linspace(10.0, 70.0, 7)
+    A = models.f_dep_attenuation(F, 0.3, 600.0, R, 3.5)
+    assert A.shape == (50, 7)
+    for j in range(7):
+        np.testing.assert_allclose(
+            A[:, j], models.f_dep_attenuation(F[:, j], 0.3, 600.0, R[j], 3.5),
+            rtol=1e-12)
+
+    S = models.compute_log_spectrum(F, np.log10(MO), FC, 1, 2, 600.0, R, 3.5,
+                                    a=0.3, motion='acc')
+    for j in range(7):
+        np.testing.assert_allclose(
+            S[:, j], models.compute_log_spectrum(
+                F[:, j], np.log10(MO[j]), FC[j], 1, 2, 600.0, R[j], 3.5,
+                a=0.3, motion='acc'), rtol=1e-12)
+
+
+def test_scalar_frequency():
+    """A scalar frequency gives a scalar result."""
+    assert np.ndim(models.motion_factor(2.0, 'vel')) == 0
+    np.testing.assert_allclose(models.motion_factor(2.0, 'vel'),
+                               np.log10(4 * np.pi), rtol=1e-12)
+    assert np.ndim(models.motion_factor(2.0)) == 0
+    assert np.ndim(models.source_scf(2.0, 17.0, 1.5, 1.5, 2)) == 0
+    assert np.ndim(models.f_dep_attenuation(2.0, 0.3, 600.0, 50.0, 3.5)) == 0
+    assert np.ndim(models.compute_log_spectrum(
+        2.0, 17.0, 1.5, 1, 2, 600.0, 50.0, 3.5, motion='vel')) == 0
+
+
+def test_zero_frequency():
+    """A 0 Hz bin gives the long period limit without warnings."""
+    f = np.fft.rfftfreq(1024, d=0.01)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        for gam, n in [(1, 2), (2, 2), (1.5, 2)]:
+            assert models.source_scf(f, 17.0, 1.5, gam, n)[0] == 17.0
+        assert models.f_dep_attenuation(f, 0.3, 600.0, 50.0, 3.5)[0] == 0.0
+        np.testing.assert_array_equal(
+            models.source_scf_batch(f, [15.0, 17.0], 1.5, 1.5, 2)[:, 0],
+            [15.0, 17.0])
+        for a in (0.0, 0.3):
+            np.testing.assert_allclose(
+                models.compute_log_spectrum(f, 17.0, 1.5, 1.5, 2, 600.0, 50.0,
+                                            3.5, a=a)[0],
+                17.0 + models.single_geospreading(50.0), rtol=1e-12)
+
+
+@pytest.mark.parametrize("gam, n", [(1, 2), (2, 2), (1.5, 2)])
+def test_source_scf_scalar_inputs(gam, n):
+    """0-d parameters are accepted and the output shape follows f."""
+    expected = models.source_scf(np.array([2.0]), 17.0, 1.5, gam, n)[0]
+    for f in (2.0, np.array(2.0)):
+        out = models.source_scf(f, 17.0, 1.5, np.array(gam), np.array(n))
+        assert np.shape(out) == ()
+        assert out == expected
+
+
+@pytest.mark.parametrize("gam, n", [(1, 2), (2, 2), (1.5, 2)])
+def test_kernels_match_numpy(f, gam, n, monkeypatch):
+    """The compiled kernels agree with the NumPy expressions."""
+    expected = (models.source_scf(f, 17.0, 1.5, gam, n),
+                models.f_dep_attenuation(f, 0.3, 600.0, 50.0, 3.5),
+                models.motion_factor(f, 'acc'),
+                models.compute_log_spectrum(f, 17.0, 1.5, gam, n, 600.0, 50.0,
+                                            3.5, a=0.3, motion='acc'),
+                models.compute_log_spectrum(f, 17.0, 1.5, gam, n, 600.0, 50.0,
+                                            3.5, motion='vel'))
+    monkeypatch.setattr(models, '_USE_KERNELS', True)
+    monkeypatch.setattr(models, '_KERNEL_MIN_SIZE', 0)
+    for result, exp in zip(
+            (models.source_scf(f, 17.0, 1.5, gam, n),
+             models.f_dep_attenuation(f, 0.3, 600.0, 50.0, 3.5),
+             models.motion_factor(f, 'acc'),
+             models.compute_log_spectrum(f, 17.0, 1.5, gam, n, 600.0, 50.0,
+                                         3.5, a=0.3, motion='acc'),
+             models.compute_log_spectrum(f, 17.0, 1.5, gam, n, 600.0, 50.0,
+                                         3.5, motion='vel')), expected):
+        np.testing.assert_allclose(result, exp, rtol=1e-12)